@@ -1,8 +1,41 @@
-import pandas as pd
 import numpy as np
 import os
 import sys
 
+from excel_io import (
+    EXCEL_ENGINE, PARQUET_AVAILABLE, key_to_text, period_to_label,
+    read_excel_cached, write_excel_streaming, write_parquet_copy
+)
+
+# --- DATAFRAME ENGINE ---
+# DF_ENGINE=modin: runs pandas operations on all cores (modin.pandas drop-in)
+# DF_ENGINE=polars: computes the per-period window metrics with Polars
+ENGINE = os.environ.get('DF_ENGINE', 'pandas')
+
+if ENGINE == 'modin':
+    import modin.pandas as pd
+else:
+    import pandas as pd
+
+if ENGINE == 'polars':
+    import polars as pl
+
+# Fused ABC kernel requires numba (optional dependency)
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+ABC_LABELS = np.array(['A', 'B', 'C'], dtype=object)
+
+# Fused elementwise expressions use numexpr when available (optional dependency)
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
 # --- PATH SETTINGS ---
 # Set the base path to the project folder.
 # This path uses the MAIN project directory.
@@ -16,6 +49,35 @@ if not os.path.exists(OUTPUT_PATH):
     print(f"Created output directory: {OUTPUT_PATH}")
 
 
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def abc_kernel(values, bounds, a_threshold, b_threshold, out):
+        """
+        Fused total / cumulative percent / ABC code pass over sorted values.
+        Period p occupies values[bounds[p]:bounds[p + 1]].
+        Writes codes 0/1/2 (A/B/C) into out.
+        """
+        for p in prange(len(bounds) - 1):
+            start = bounds[p]
+            end = bounds[p + 1]
+
+            total = 0.0
+            for i in range(start, end):
+                total += values[i]
+
+            cum = 0.0
+            for i in range(start, end):
+                cum += values[i]
+                if total == 0:
+                    out[i] = 2
+                elif cum / total <= a_threshold:
+                    out[i] = 0
+                elif cum / total <= b_threshold:
+                    out[i] = 1
+                else:
+                    out[i] = 2
+
+
 def load_data(stock_file: str = 'Stock.xlsx', cogs_file: str = 'COGS.xlsx') -> tuple[pd.DataFrame, pd.DataFrame]:
     """Loads Stock and COGS data from the specified input directory."""
     try:
@@ -23,10 +85,10 @@ def load_data(stock_file: str = 'Stock.xlsx', cogs_file: str = 'COGS.xlsx') -> t
         cogs_path = os.path.join(INPUT_PATH, cogs_file)
 
         print(f"Loading Stock: {stock_path}")
-        stock = pd.read_excel(stock_path)
+        stock = read_excel_cached(stock_path, dtypes={'Stock': np.float64})
 
         print(f"Loading COGS: {cogs_path}")
-        cogs = pd.read_excel(cogs_path)
+        cogs = read_excel_cached(cogs_path, dtypes={'COGS': np.float64})
 
         # Check for required columns
         if 'Date' not in stock.columns or 'Stock' not in stock.columns:
@@ -58,24 +120,50 @@ def transform_data(stock: pd.DataFrame, cogs: pd.DataFrame) -> pd.DataFrame:
     # --- 1. Create 'Period' column ---
     # New 'Period' column based on 'Date'
     print("Transformation: Creating 'Period' column...")
-    stock['Period'] = pd.to_datetime(stock['Date']).dt.strftime('%Y-%m')
+    # Integer month code (year * 12 + month - 1) instead of a 'YYYY-MM' string
+    dates = pd.to_datetime(stock['Date'])
+    # Integer codes cannot hold NaT: rows without a valid date are skipped
+    invalid_dates = dates.isna()
+    if invalid_dates.any():
+        print(f"Warning: {invalid_dates.sum()} rows with empty or invalid 'Date' were skipped.")
+        stock = stock.loc[~invalid_dates].copy()
+        dates = dates[~invalid_dates]
+    stock['Period'] = (dates.dt.year * 12 + dates.dt.month - 1).astype('int32')
     del stock['Date']
 
+    # Each file is loaded on its own, so one SKU column may come back as text
+    # (e.g. mixed 1001 / 'B2') and the other as numbers: match them as text then
+    if stock['SKU'].dtype != cogs['SKU'].dtype:
+        stock['SKU'] = key_to_text(stock['SKU'])
+        cogs = cogs.assign(SKU=key_to_text(cogs['SKU']))
+
+    # Categorical SKU: groupby/merge work on integer codes instead of strings
+    stock['SKU'] = stock['SKU'].astype('category')
+
     # --- 2. Vlookup COGS column to Stock table ---
-    print("Transformation: Merging COGS (Vlookup)...")
-    stock_cogs = pd.merge(stock, cogs, how='left', on='SKU')
+    print("Transformation: Looking up COGS (Vlookup)...")
+    # One lookup per distinct SKU, then an integer take per row (first COGS row wins)
+    cogs_series = cogs.drop_duplicates('SKU').set_index('SKU')['COGS']
+    sku_codes = stock['SKU'].cat.codes.to_numpy()
+    cogs_by_sku = cogs_series.reindex(stock['SKU'].cat.categories).to_numpy(dtype=np.float64)
 
     # --- 3. New Stock Value column creation ---
     print("Transformation: Creating 'Value' column...")
-    # Handle NaN values in COGS after merge
-    stock_cogs['COGS'] = stock_cogs['COGS'].fillna(0)
-    stock_cogs['Value'] = stock_cogs['Stock'] * stock_cogs['COGS']
+    # Handle missing COGS as 0 (code -1 = empty SKU picks the appended 0.0)
+    cogs_values = np.nan_to_num(np.append(cogs_by_sku, 0.0)[sku_codes], nan=0.0)
+    stock_values = stock['Stock'].to_numpy(dtype=np.float64)
+    if NUMEXPR_AVAILABLE:
+        values = ne.evaluate('stock * cogs', local_dict={'stock': stock_values, 'cogs': cogs_values})
+    else:
+        values = np.multiply(stock_values, cogs_values, out=np.empty_like(stock_values))
 
     # --- 4. Choose columns in a specific order ---
     print("Transformation: Selecting final columns...")
-    required_cols = ['SKU', 'Period', 'Value']
-    # Use .copy() to avoid SettingWithCopyWarning
-    abc_input = stock_cogs[required_cols].copy()
+    abc_input = pd.DataFrame({
+        'SKU': stock['SKU'].values,
+        'Period': stock['Period'].to_numpy(),
+        'Value': values
+    })
 
     return abc_input
 
@@ -97,67 +185,91 @@ def assign_abc_groups(df: pd.DataFrame, a_threshold: float = 0.80, b_threshold:
     if not pd.api.types.is_numeric_dtype(df['Value']):
         raise TypeError("'Value' column must be numeric (float or int).")
 
-    # Fill missing values in the Value column
-    df = df.copy()
-    df['Value'] = df['Value'].fillna(0.0)
+    # Fill missing values in the Value column (new array, input df is not copied)
+    row_values = np.nan_to_num(df['Value'].to_numpy(dtype=np.float64), nan=0.0)
 
     # === 2. Aggregate total values per SKU/Period ===
     # Sum values to ensure a single row per SKU for each period
+    # (grouped by the key arrays directly, no intermediate key frame)
     agg_df = (
-        df.groupby(['Period', 'SKU'], as_index=False)['Value']
+        pd.Series(row_values, name='Value')
+        .groupby([df['Period'].values, df['SKU'].values], observed=True)
         .sum()
+        .rename_axis(['Period', 'SKU'])
+        .reset_index()
     )
 
     # === 3. Sort, rank and compute cumulative metrics ===
     agg_df = agg_df.sort_values(['Period', 'Value'], ascending=[True, False])
 
-    # Calculate total value per period
-    agg_df['Total_Period_Value'] = agg_df.groupby('Period')['Value'].transform('sum')
-
-    # Calculate cumulative value per period
-    agg_df['Cumulative_Value'] = agg_df.groupby('Period')['Value'].cumsum()
-
-    # Calculate cumulative percentage (protection against division by zero)
-    agg_df['Cumulative_Percent'] = np.where(
-        agg_df['Total_Period_Value'] == 0,
-        1.0,
-        agg_df['Cumulative_Value'] / agg_df['Total_Period_Value']
-    )
-
-    # === 4. ABC Group assignment ===
-    def classify_abc(cum_pct: float, total_val: float) -> str:
-        """Determines the ABC class."""
-        if total_val == 0:
-            return 'C'
-        # Group A: Top 80% (0.0 - 0.80)
-        if cum_pct <= a_threshold:
-            return 'A'
-        # Group B: Next 15% (0.80 - 0.95)
-        elif cum_pct <= b_threshold:
-            return 'B'
-        # Group C: Bottom 5% (0.95 - 1.00)
+    # Period ids 0..P-1 in sort order: rows of period p are values[bounds[p]:bounds[p + 1]]
+    values = agg_df['Value'].to_numpy(dtype=np.float64)
+    period_codes, _ = pd.factorize(agg_df['Period'].to_numpy(), sort=True)
+    bounds = np.r_[0, np.cumsum(np.bincount(period_codes))].astype(np.int64)
+
+    if NUMBA_AVAILABLE and ENGINE == 'pandas':
+        # === 4. ABC Group assignment (fused Numba kernel) ===
+        codes = np.empty(len(values), dtype=np.int8)
+        abc_kernel(values, bounds, a_threshold, b_threshold, codes)
+        agg_df['ABC_Group'] = np.take(ABC_LABELS, codes)
+    else:
+        if ENGINE == 'polars':
+            # Window functions keep the row order, so the pandas sort above still applies
+            window_df = pl.from_pandas(agg_df[['Period', 'Value']]).select(
+                pl.col('Value').sum().over('Period').alias('Total_Period_Value'),
+                pl.col('Value').cum_sum().over('Period').alias('Cumulative_Value')
+            )
+            agg_df['Total_Period_Value'] = window_df['Total_Period_Value'].to_numpy()
+            agg_df['Cumulative_Value'] = window_df['Cumulative_Value'].to_numpy()
         else:
-            return 'C'
-
-    # Apply classification
-    agg_df['ABC_Group'] = agg_df.apply(
-        lambda x: classify_abc(x['Cumulative_Percent'], x['Total_Period_Value']),
-        axis=1
-    )
+            # Calculate total value per period (indexed add, no hashing)
+            totals = np.bincount(period_codes, weights=values)
+            agg_df['Total_Period_Value'] = totals[period_codes]
+
+            # Calculate cumulative value per period (accumulated within each period,
+            # so a large earlier period cannot eat the precision of a later one)
+            cum_values = np.empty_like(values)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                np.cumsum(values[start:end], out=cum_values[start:end])
+            agg_df['Cumulative_Value'] = cum_values
+
+        # Calculate cumulative percentage (protection against division by zero)
+        agg_df['Cumulative_Percent'] = np.where(
+            agg_df['Total_Period_Value'] == 0,
+            1.0,
+            agg_df['Cumulative_Value'] / agg_df['Total_Period_Value']
+        )
+
+        # === 4. ABC Group assignment ===
+        cum_pct = agg_df['Cumulative_Percent'].to_numpy()
+        total_val = agg_df['Total_Period_Value'].to_numpy()
+
+        conditions = [
+            (total_val == 0),            # No value in period
+            (cum_pct <= a_threshold),    # Group A: Top 80% (0.0 - 0.80)
+            (cum_pct <= b_threshold)     # Group B: Next 15% (0.80 - 0.95)
+        ]
+
+        choices = ['C', 'A', 'B']
+        default_choice = 'C'  # Group C: Bottom 5% (0.95 - 1.00)
+
+        agg_df['ABC_Group'] = np.select(conditions, choices, default=default_choice)
 
     # === 5. Merge results back into original DataFrame ===
-    # Join the ABC group back to the original DataFrame
-    result_df = pd.merge(
-        df,
-        agg_df[['Period', 'SKU', 'ABC_Group']],
-        on=['Period', 'SKU'],
-        how='left'
-    )
+    # Join the ABC group back to the original DataFrame (lookup on the (Period, SKU) index)
+    abc_lookup = agg_df.set_index(['Period', 'SKU'])['ABC_Group']
+    result_df = df.join(abc_lookup, on=['Period', 'SKU'], how='left')
+    # Left join keeps the row order of df. Value is rewritten only when NaNs
+    # were filled, so an integer column keeps its dtype (as with fillna)
+    if df['Value'].hasnans:
+        result_df['Value'] = df['Value'].fillna(0.0).array
 
     # === 6. Validation (check if all rows received a group) ===
-    if result_df['ABC_Group'].isna().any():
+    # One mask, ndarray.any() stops at the first missing group
+    missing_mask = pd.isna(result_df['ABC_Group'].to_numpy())
+    if missing_mask.any():
         # Add debugging details
-        missing_count = result_df['ABC_Group'].isna().sum()
+        missing_count = int(missing_mask.sum())
         raise RuntimeError(f"ABC group assignment failed for {missing_count} rows. Check input data.")
 
     print("ABC classification successfully completed.")
@@ -167,30 +279,35 @@ def assign_abc_groups(df: pd.DataFrame, a_threshold: float = 0.80, b_threshold:
 def save_local_file(data: pd.DataFrame, name: str) -> None:
     """
     Saves DataFrame to an Excel file in the output directory.
-    Uses openpyxl or xlsxwriter engine.
+    Uses xlsxwriter (streaming, constant memory) or openpyxl engine.
+    A Parquet copy is written alongside when pyarrow is available.
     """
+    # Integer period codes -> 'YYYY-MM' for the output file
+    if 'Period' in data.columns and pd.api.types.is_integer_dtype(data['Period']):
+        data = data.assign(Period=period_to_label(data['Period']))
+
     dump_file_name = f"{name}.xlsx"
     data_dump = os.path.join(OUTPUT_PATH, dump_file_name)
 
     print(f"\nSaving data to file: {data_dump}")
 
-    # Determine which engine is available
-    engine_used = "openpyxl"
-    try:
-        import xlsxwriter
-        engine_used = "xlsxwriter"
-    except ImportError:
-        pass  # openpyxl is usually available by default with pandas
+    engine_used = EXCEL_ENGINE
 
     try:
-        writer = pd.ExcelWriter(data_dump, engine=engine_used)
-        data.to_excel(writer, sheet_name="ABC_Result", index=False)
-        writer.close()
+        if engine_used == "xlsxwriter":
+            write_excel_streaming({"ABC_Result": data}, data_dump)
+        else:
+            writer = pd.ExcelWriter(data_dump, engine=engine_used)
+            data.to_excel(writer, sheet_name="ABC_Result", index=False)
+            writer.close()
         print(f"✅ Data successfully saved using {engine_used.upper()}.")
     except Exception as e:
         print(f"❌ Error saving file: {e}")
         print("Please ensure the file is not open in another program.")
 
+    if PARQUET_AVAILABLE:
+        write_parquet_copy(data, os.path.join(OUTPUT_PATH, f"{name}.parquet"))
+
 
 # --- MAIN SCRIPT LOGIC ---
 if __name__ == "__main__":
@@ -202,7 +319,11 @@ if __name__ == "__main__":
     stock_df, cogs_df = load_data(stock_file='Stock.xlsx', cogs_file='COGS.xlsx')
 
     # 2. Transform data
-    abc_input_df = transform_data(stock_df, cogs_df)
+    try:
+        abc_input_df = transform_data(stock_df, cogs_df)
+    except ValueError as e:
+        print(f"\nDATA FORMAT ERROR: {e}\n")
+        sys.exit(1)
 
     # 3. Execute ABC classification function
     try:
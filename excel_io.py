@@ -0,0 +1,184 @@
+"""Excel / Parquet input-output helpers shared by abc_analyzer.py and xyz_analyzer.py."""
+import numpy as np
+import openpyxl
+import os
+from typing import Optional
+
+# --- DATAFRAME ENGINE ---
+# Same switch as in the analyzers, so frames built here match theirs
+ENGINE = os.environ.get('DF_ENGINE', 'pandas')
+
+if ENGINE == 'modin':
+    import modin.pandas as pd
+else:
+    import pandas as pd
+
+# Excel writer engine, resolved once (openpyxl is usually available by default with pandas)
+try:
+    import xlsxwriter
+    EXCEL_ENGINE = "xlsxwriter"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# Parquet cache and Arrow-backed columns require pyarrow (optional dependency)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def dedup_header(header: list) -> list:
+    """
+    Names columns like read_excel: empty header cells become 'Unnamed: i',
+    repeated names get the first '.1', '.2', ... suffix not already in the header.
+    """
+    unnamed = [i for i, h in enumerate(header) if h is None]
+    header = [f"Unnamed: {i}" if h is None else h for i, h in enumerate(header)]
+    taken = set(header)
+    counts = {}
+    # Same order as pandas: named columns first, then the unnamed ones
+    for i in [i for i in range(len(header)) if i not in unnamed] + unnamed:
+        name = base = header[i]
+        count = counts.get(base, 0)
+        while count > 0:
+            counts[base] = count + 1
+            name = f"{base}.{count}"
+            count = count + 1 if name in taken else counts.get(name, 0)
+        header[i] = name
+        counts[name] = count + 1
+    return header
+
+
+def read_xlsx_streaming(file_path: str, dtypes: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Reads the first sheet with openpyxl in read-only mode, one row at a time.
+    Columns listed in dtypes are built as typed NumPy arrays, the rest are inferred.
+    """
+    dtypes = dtypes or {}
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.active
+        worksheet.reset_dimensions()
+        rows = worksheet.iter_rows(values_only=True)
+
+        header = list(next(rows, ()))
+        columns = [[] for _ in header]
+        n_rows = 0
+
+        for row in rows:
+            # Skip fully empty rows
+            if all(v is None for v in row):
+                continue
+            # Data wider than the header: trailing header cells were empty
+            while len(columns) < len(row):
+                header.append(None)
+                columns.append([None] * n_rows)
+            for i, column in enumerate(columns):
+                column.append(row[i] if i < len(row) else None)
+            n_rows += 1
+    finally:
+        workbook.close()
+
+    header = dedup_header(header)
+
+    df = pd.DataFrame({
+        i: np.asarray(column, dtype=dtypes[name]) if name in dtypes else column
+        for i, (name, column) in enumerate(zip(header, columns))
+    })
+    df.columns = header
+    return df
+
+
+def key_to_text(values: pd.Series) -> pd.Series:
+    """
+    Key values as text: 1001 and 1001.0 both become '1001', 'B2' stays 'B2'.
+    Missing keys stay missing.
+    """
+    values = values.astype(object)
+    text = values.map(lambda v: str(int(v)) if isinstance(v, float) and v.is_integer() else str(v))
+    return text.where(values.notna())
+
+
+def key_columns_to_str(df: pd.DataFrame, key_columns: tuple = ('SKU',)) -> pd.DataFrame:
+    """
+    Casts object key columns (e.g. SKUs mixing 1 and 'B2') to str so Arrow can store them.
+    Missing keys stay missing. Returns a new frame if anything changed.
+    """
+    for col in key_columns:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            is_object = values.cat.categories.dtype == object
+        else:
+            is_object = values.dtype == object
+        if is_object:
+            df = df.assign(**{col: key_to_text(values)})
+    return df
+
+
+def read_excel_cached(file_path: str, dtypes: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Reads an Excel file through a Parquet cache stored next to it.
+    The cache is rebuilt whenever the Excel file is newer than the cache.
+    With pyarrow available, columns come back Arrow-backed (pd.ArrowDtype).
+    """
+    cache_path = f"{file_path}.parquet"
+
+    if PARQUET_AVAILABLE and os.path.exists(cache_path) \
+            and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        return pd.read_parquet(cache_path, engine='pyarrow', dtype_backend='pyarrow')
+
+    df = read_xlsx_streaming(file_path, dtypes)
+
+    if PARQUET_AVAILABLE:
+        try:
+            table = pa.Table.from_pandas(key_columns_to_str(df), preserve_index=False)
+            pq.write_table(table, cache_path)
+            # Arrow-backed columns in an engine frame (modin under DF_ENGINE=modin),
+            # same as on a cache hit
+            df = pd.DataFrame(table.to_pandas(types_mapper=pd.ArrowDtype))
+        except Exception as e:
+            print(f"Warning: could not write Parquet cache {cache_path}: {e}")
+
+    return df
+
+
+def period_to_label(period: pd.Series) -> pd.Series:
+    """Converts integer period codes (year * 12 + month - 1) back to 'YYYY-MM'."""
+    return (period // 12).astype(str) + '-' + (period % 12 + 1).astype(str).str.zfill(2)
+
+
+def write_excel_streaming(sheets: dict, path: str) -> None:
+    """
+    Writes {sheet_name: DataFrame} row by row with xlsxwriter in constant_memory mode.
+    pandas' to_excel emits cells column by column, which constant_memory
+    mode cannot handle, so rows are written directly.
+    """
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        header_format = workbook.add_format({'bold': True})
+        for sheet_name, data in sheets.items():
+            if ENGINE == 'modin':
+                # Modin's itertuples converts one row at a time and fails on
+                # categorical columns: convert the whole frame once instead
+                data = data._to_pandas()
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(c) for c in data.columns], header_format)
+
+            for row_idx, row in enumerate(data.itertuples(index=False, name=None), start=1):
+                # Empty cell for NaN, like to_excel
+                worksheet.write_row(row_idx, 0, [None if pd.isna(v) else v for v in row])
+    finally:
+        workbook.close()
+
+
+def write_parquet_copy(data: pd.DataFrame, path: str) -> None:
+    """Writes a Parquet copy of an output table (for downstream steps)."""
+    try:
+        key_columns_to_str(data).to_parquet(path, engine='pyarrow', index=False)
+        print(f"✅ Parquet copy saved: {path}")
+    except Exception as e:
+        print(f"❌ Error saving Parquet copy: {e}")
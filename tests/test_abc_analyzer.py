@@ -0,0 +1,112 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import abc_analyzer  # noqa: E402
+
+
+def test_cumulative_share_not_affected_by_large_earlier_period(monkeypatch):
+    """A huge earlier period must not skew the cumulative share of a later one."""
+    monkeypatch.setattr(abc_analyzer, 'NUMBA_AVAILABLE', False)
+
+    df = pd.DataFrame({
+        'SKU': ['big', 'a', 'b', 'c', 'd'],
+        'Period': [100, 101, 101, 101, 101],
+        'Value': [3e16, 70.0, 12.0, 10.0, 8.0]
+    })
+
+    result = abc_analyzer.assign_abc_groups(df)
+    groups = dict(zip(result['SKU'], result['ABC_Group']))
+
+    # Period 101 shares: a 0.70, b 0.82, c 0.92, d 1.00
+    assert groups == {'big': 'C', 'a': 'A', 'b': 'B', 'c': 'B', 'd': 'C'}
+
+
+def test_cogs_lookup_matches_numeric_and_mixed_sku_files(tmp_path, monkeypatch):
+    """Integer SKUs in Stock.xlsx must still find COGS when COGS.xlsx mixes 1001 and 'B2'."""
+    monkeypatch.setattr(abc_analyzer, 'INPUT_PATH', str(tmp_path))
+    pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-15', '2024-01-20', '2024-02-10']),
+        'SKU': [1001, 1002, 1001],
+        'Stock': [1.0, 4.0, 3.0]
+    }).to_excel(tmp_path / 'Stock.xlsx', index=False)
+    pd.DataFrame({
+        'SKU': [1001, 1002, 'B2'],
+        'COGS': [10.0, 10.0, 5.0]
+    }).to_excel(tmp_path / 'COGS.xlsx', index=False)
+
+    # First run builds the Parquet caches, the second one reads them
+    for _ in range(2):
+        stock, cogs = abc_analyzer.load_data()
+        result = abc_analyzer.transform_data(stock, cogs)
+        assert result['Value'].tolist() == [10.0, 40.0, 30.0]
+
+
+def test_rows_without_date_are_skipped():
+    """A blank Date drops that row instead of rejecting the whole file."""
+    stock = pd.DataFrame({
+        'Date': [pd.Timestamp('2024-01-05'), None, pd.Timestamp('2024-02-05')],
+        'SKU': ['a', 'b', 'a'],
+        'Stock': [1.0, 2.0, 3.0]
+    })
+    cogs = pd.DataFrame({'SKU': ['a', 'b'], 'COGS': [10.0, 20.0]})
+
+    result = abc_analyzer.transform_data(stock, cogs)
+
+    assert result['Value'].tolist() == [10.0, 30.0]
+    assert abc_analyzer.period_to_label(result['Period']).tolist() == ['2024-01', '2024-02']
+
+
+def reference_abc_groups(df, a_threshold=0.80, b_threshold=0.95):
+    """Baseline pandas ABC: groupby sum, sort, transform(sum) and groupby().cumsum()."""
+    agg = df.groupby(['Period', 'SKU'], as_index=False, observed=True)['Value'].sum()
+    agg = agg.sort_values(['Period', 'Value'], ascending=[True, False])
+    total = agg.groupby('Period')['Value'].transform('sum')
+    cum_pct = agg.groupby('Period')['Value'].cumsum() / total
+    agg['ABC_Group'] = np.select(
+        [total == 0, cum_pct <= a_threshold, cum_pct <= b_threshold], ['C', 'A', 'B'], default='C'
+    )
+    return {(p, s): g for p, s, g in zip(agg['Period'], agg['SKU'], agg['ABC_Group'])}
+
+
+@pytest.mark.parametrize('path', ['numba', 'numpy', 'polars'])
+def test_abc_paths_match_pandas_reference(monkeypatch, path):
+    """The Numba kernel, the NumPy fallback and the Polars window path agree with pandas."""
+    if path == 'numba':
+        pytest.importorskip('numba')
+        if not abc_analyzer.NUMBA_AVAILABLE:
+            pytest.skip('abc_analyzer was imported without numba')
+    else:
+        monkeypatch.setattr(abc_analyzer, 'NUMBA_AVAILABLE', False)
+    if path == 'polars':
+        monkeypatch.setattr(abc_analyzer, 'ENGINE', 'polars')
+        monkeypatch.setattr(abc_analyzer, 'pl', pytest.importorskip('polars'), raising=False)
+
+    # Period 1: shares a 0.40, b 0.73, c 0.88, d 0.96, e 1.00 ('a' split over two rows),
+    # period 2: zero total, period 3: a single SKU
+    df = pd.DataFrame({
+        'SKU': pd.Categorical(['e', 'a', 'c', 'x', 'b', 'a', 'd', 'y', 'a', 'x']),
+        'Period': np.array([1, 1, 1, 2, 1, 1, 1, 2, 3, 2], dtype='int32'),
+        'Value': [4.0, 25.0, 15.0, 0.0, 33.0, 15.0, 8.0, 0.0, 7.0, 0.0]
+    })
+
+    result = abc_analyzer.assign_abc_groups(df)
+    groups = {(p, s): g for p, s, g in zip(result['Period'], result['SKU'], result['ABC_Group'])}
+
+    assert groups == reference_abc_groups(df)
+    assert groups[(1, 'b')] == 'A' and groups[(1, 'c')] == 'B' and groups[(2, 'x')] == 'C'
+
+
+def test_integer_value_keeps_its_dtype():
+    """Without NaNs to fill, an integer Value column is returned unchanged (as with fillna)."""
+    df = pd.DataFrame({'SKU': ['a', 'b'], 'Period': [1, 1], 'Value': [3, 1]})
+
+    result = abc_analyzer.assign_abc_groups(df)
+
+    assert result['Value'].dtype == df['Value'].dtype
+    assert result['Value'].tolist() == [3, 1]
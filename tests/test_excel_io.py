@@ -0,0 +1,23 @@
+import os
+import sys
+
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import excel_io  # noqa: E402
+
+
+def test_streaming_reader_names_columns_like_read_excel(tmp_path):
+    """Empty and repeated header cells get the same names as in pd.read_excel."""
+    path = tmp_path / 'headers.xlsx'
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(['x', 'x', None, 'x.1', 'x'])
+    worksheet.append([1, 2, 3, 4, 5])
+    workbook.save(path)
+
+    df = excel_io.read_xlsx_streaming(str(path))
+
+    assert list(df.columns) == list(pd.read_excel(path).columns)
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xyz_analyzer  # noqa: E402
+
+
+def reference_xyz_stats(df, data_mode):
+    """Baseline XYZ: SKU x Period scaffold (dense), groupby.agg(std) and Series.quantile."""
+    period_sum = df.groupby(['SKU', 'Period'], as_index=False)['Value'].sum()
+    if data_mode == 'dense':
+        scaffold = pd.MultiIndex.from_product(
+            [df['SKU'].unique(), df['Period'].unique()], names=['SKU', 'Period']
+        ).to_frame(index=False)
+        stats_input = pd.merge(scaffold, period_sum, on=['SKU', 'Period'], how='left').fillna({'Value': 0.0})
+    else:
+        stats_input = period_sum
+
+    stats = stats_input.groupby('SKU')['Value'].agg(n_periods='count', mean_value='mean', std_value='std')
+    stats['std_value'] = stats['std_value'].fillna(0.0)
+    stats['cv'] = np.where(stats['mean_value'] == 0, 0.0, stats['std_value'] / np.abs(stats['mean_value']))
+
+    eligible = stats.loc[(stats['n_periods'] >= 2) & (stats['mean_value'] != 0), 'cv'].dropna()
+    if eligible.empty:
+        x_threshold = y_threshold = 0.0
+    else:
+        x_threshold, y_threshold = eligible.quantile([0.33, 0.66])
+
+    stats['XYZ'] = np.select(
+        [stats['n_periods'] < 2, stats['mean_value'] == 0,
+         stats['cv'] <= x_threshold, stats['cv'] <= y_threshold],
+        ['', '', 'X', 'Y'], default='Z'
+    )
+    return stats, x_threshold, y_threshold
+
+
+def make_stock(seed=0):
+    """Random SKU/Period rows plus constant, single-period, all-zero and large-offset SKUs."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(40):
+        periods = rng.choice(12, size=rng.integers(1, 13), replace=False)
+        # Some periods get two rows, which the aggregation has to sum
+        for period in np.r_[periods, periods[:2]]:
+            rows.append((f"g{i:02d}", period, float(rng.gamma(2.0, 10.0))))
+    rows += [('const', p, 5.0) for p in range(12)]
+    rows += [('single', 7, 3.0)]
+    rows += [('zero', p, 0.0) for p in range(3)]
+    rows += [('offset', p, 1e6 + float(rng.random())) for p in range(12)]
+
+    df = pd.DataFrame(rows, columns=['SKU', 'Period', 'Value'])
+    df['Period'] = df['Period'].astype('int32')
+    return df
+
+
+@pytest.mark.parametrize('data_mode', ['dense', 'sparse'])
+def test_xyz_matches_baseline_scaffold(data_mode):
+    """Analytic dense fill-in, shifted sums of squares and partition quantiles match pandas."""
+    df = make_stock()
+    expected, x_threshold, y_threshold = reference_xyz_stats(df, data_mode)
+
+    result = xyz_analyzer.assign_xyz_groups(df.assign(SKU=df['SKU'].astype('category')), data_mode=data_mode)
+    per_sku = result.drop_duplicates('SKU').set_index('SKU').loc[expected.index]
+
+    thresholds = result.attrs['thresholds']
+    assert thresholds['x_threshold_33'] == pytest.approx(x_threshold, rel=1e-9)
+    assert thresholds['y_threshold_66'] == pytest.approx(y_threshold, rel=1e-9)
+    np.testing.assert_allclose(per_sku['CV'], expected['cv'], rtol=1e-9, atol=1e-12)
+    assert per_sku['XYZ'].tolist() == expected['XYZ'].tolist()
+
+    # A constant series has exactly zero spread, not a rounding residue
+    assert per_sku.loc['const', 'CV'] == 0.0
+    assert per_sku.loc['zero', 'XYZ'] == ''
+    if data_mode == 'sparse':
+        assert per_sku.loc['single', 'XYZ'] == ''
+
+
+@pytest.mark.parametrize('n_skus', [1, 2, 3, 4, 7, 10, 31])
+def test_thresholds_match_series_quantile(n_skus):
+    """Interpolated np.partition quantiles equal Series.quantile for small and odd sizes."""
+    rng = np.random.default_rng(n_skus)
+    second = 1.0 + rng.random(n_skus) * 3
+    df = pd.DataFrame({
+        'SKU': pd.Categorical(np.repeat([f"s{i}" for i in range(n_skus)], 2)),
+        'Period': np.tile(np.array([0, 1], dtype='int32'), n_skus),
+        'Value': np.column_stack([np.ones(n_skus), second]).ravel()
+    })
+
+    result, thresholds = xyz_analyzer.assign_xyz_groups(df, data_mode='sparse', return_thresholds=True)
+    cvs = result.drop_duplicates('SKU')['CV']
+    expected = pd.Series(cvs.to_numpy()).quantile([0.33, 0.66])
+
+    assert thresholds['x_threshold_33'] == pytest.approx(expected[0.33], rel=1e-12)
+    assert thresholds['y_threshold_66'] == pytest.approx(expected[0.66], rel=1e-12)
+
+
+def test_value_dtype_matches_fillna():
+    """An integer Value keeps its dtype; NaNs in a float Value become 0."""
+    df = pd.DataFrame({'SKU': ['a', 'a', 'b'], 'Period': [0, 1, 0], 'Value': [3, 1, 2]})
+
+    result = xyz_analyzer.assign_xyz_groups(df)
+    assert result['Value'].dtype == df['Value'].dtype
+
+    result = xyz_analyzer.assign_xyz_groups(df.assign(Value=[3.0, np.nan, 2.0]))
+    assert result['Value'].tolist() == [3.0, 0.0, 2.0]
@@ -1,8 +1,28 @@
-import pandas as pd
 import numpy as np
 import os
 import sys
-from typing import Literal
+from typing import Literal, Optional, Tuple, Union
+
+from excel_io import (
+    EXCEL_ENGINE, PARQUET_AVAILABLE, period_to_label, read_excel_cached,
+    write_excel_streaming, write_parquet_copy
+)
+
+# --- DATAFRAME ENGINE ---
+# DF_ENGINE=modin: runs pandas operations on all cores (modin.pandas drop-in)
+ENGINE = os.environ.get('DF_ENGINE', 'pandas')
+
+if ENGINE == 'modin':
+    import modin.pandas as pd
+else:
+    import pandas as pd
+
+# Fused elementwise expressions use numexpr when available (optional dependency)
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
 
 # --- PATH SETTINGS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,7 +44,7 @@ def load_stock_data(file_name: str = 'Stock.xlsx') -> pd.DataFrame:
         sys.exit(1)
 
     try:
-        df = pd.read_excel(file_path)
+        df = read_excel_cached(file_path, dtypes={'Stock': np.float64})
         return df
     except Exception as e:
         print(f"❌ Error reading Excel: {e}")
@@ -39,10 +59,22 @@ def prepare_data(stock: pd.DataFrame) -> pd.DataFrame:
     if 'Date' not in stock.columns:
         raise ValueError("Column 'Date' is missing from the file")
 
-    # Create Period column (YYYY-MM)
-    stock['Period'] = pd.to_datetime(stock['Date']).dt.strftime('%Y-%m')
+    # Create Period column as integer month code (year * 12 + month - 1)
+    dates = pd.to_datetime(stock['Date'])
+    # Integer codes cannot hold NaT: rows without a valid date are skipped
+    invalid_dates = dates.isna()
+    if invalid_dates.any():
+        print(f"Warning: {invalid_dates.sum()} rows with empty or invalid 'Date' were skipped.")
+        stock = stock.loc[~invalid_dates].copy()
+        dates = dates[~invalid_dates]
+    stock['Period'] = (dates.dt.year * 12 + dates.dt.month - 1).astype('int32')
     del stock['Date']
 
+    # Categorical SKU: groupby/merge work on integer codes instead of strings
+    if 'SKU' not in stock.columns:
+        raise ValueError("Column 'SKU' is missing from the file")
+    stock['SKU'] = stock['SKU'].astype('category')
+
     # Rename Stock -> Value for XYZ function universality
     if 'Stock' in stock.columns:
         stock.rename(columns={'Stock': 'Value'}, inplace=True)
@@ -55,14 +87,18 @@ def prepare_data(stock: pd.DataFrame) -> pd.DataFrame:
 
 def assign_xyz_groups(
         df: pd.DataFrame,
-        data_mode: Literal["dense", "sparse"] = "dense"
-) -> pd.DataFrame:
+        data_mode: Literal["dense", "sparse"] = "dense",
+        return_thresholds: bool = False
+) -> Union[pd.DataFrame, Tuple[pd.DataFrame, dict]]:
     """
     Performs XYZ analysis (classification by stability).
 
     data_mode="dense" (default):
         Fills missing months with zeros. Crucial for correct stability calculation.
         If a product was out of stock for a month, it affects its reliability.
+
+    return_thresholds=True returns (result, thresholds) instead of relying on
+    result.attrs, which modin frames do not keep.
     """
     print(f"Executing XYZ analysis (mode: {data_mode})...")
 
@@ -75,62 +111,79 @@ def assign_xyz_groups(
         missing = required - set(df.columns)
         raise ValueError(f"Missing columns: {missing}")
 
-    df_out = df.copy()
-
     # --- 1. Convert Value to numeric ---
-    if not pd.api.types.is_numeric_dtype(df_out["Value"]):
-        df_out["Value"] = pd.to_numeric(df_out["Value"], errors="coerce").fillna(0.0)
+    # Works on a new array; the input df is not copied
+    is_numeric = pd.api.types.is_numeric_dtype(df["Value"])
+    if not is_numeric:
+        values = pd.to_numeric(df["Value"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
     else:
-        df_out["Value"] = df_out["Value"].fillna(0.0)
+        values = np.nan_to_num(df["Value"].to_numpy(dtype=np.float64), nan=0.0)
 
     # --- 2. Aggregation (SKU, Period) ---
+    # Grouped by the key arrays directly, no intermediate key frame
     period_sum = (
-        df_out.groupby(["SKU", "Period"], as_index=False)["Value"]
+        pd.Series(values, name="Value")
+        .groupby([df["SKU"].values, df["Period"].values], observed=True)
         .sum()
+        .rename_axis(["SKU", "Period"])
+        .reset_index()
     )
 
-    # --- 3. Data Densification ---
+    # --- 3-4. Statistics Calculation (Mean and Standard Deviation) ---
+    # SKU ids 0..N-1; period_sum is sorted by SKU, so each SKU is one contiguous run
+    sku_codes, sku_labels = pd.factorize(period_sum["SKU"], sort=True)
+    period_values = period_sum["Value"].to_numpy(dtype=np.float64)
+    k = np.bincount(sku_codes, minlength=len(sku_labels))
+
+    # Shift each SKU by its first value so the sum of squares stays exact
+    # (a constant series gives std = 0, not a rounding residue)
+    shift = period_values[np.r_[0, np.cumsum(k)[:-1]]] if len(k) else np.empty(0)
+    shifted = period_values - shift[sku_codes]
+
+    # Count, sum and sum of squares per SKU as indexed adds (no hashing)
+    s_shifted = np.bincount(sku_codes, weights=shifted, minlength=len(sku_labels))
+    sq_shifted = np.bincount(sku_codes, weights=shifted ** 2, minlength=len(sku_labels))
+
     if data_mode == "dense":
-        # Create a grid of all possible SKUs and Periods
-        all_skus = df_out['SKU'].unique()
-        all_periods = df_out['Period'].unique()
-
-        df_scaffold = pd.MultiIndex.from_product(
-            [all_skus, all_periods],
-            names=['SKU', 'Period']
-        ).to_frame(index=False)
-
-        # Merge actual data with the full grid
-        df_dense = pd.merge(
-            df_scaffold,
-            period_sum,
-            on=["SKU", "Period"],
-            how="left"
-        )
-        # Fill gaps with zeros
-        df_dense["Value"] = df_dense["Value"].fillna(0.0)
-        stats_input_df = df_dense
+        # Missing months count as zeros. Their contribution to mean/std is added
+        # analytically instead of materializing the full SKU x Period grid.
+        n_periods = len(df['Period'].unique())
     else:
-        stats_input_df = period_sum
+        n_periods = k
 
-    # --- 4. Statistics Calculation (Mean and Standard Deviation) ---
-    sku_stats = (
-        stats_input_df.groupby("SKU", as_index=False)["Value"]
-        .agg(n_periods="count", mean_value="mean", std_value="std")
-    )
+    # Each missing month is a zero, i.e. a shifted value of -shift
+    n_missing = n_periods - k
+    s_full = s_shifted - n_missing * shift
+    sq_full = sq_shifted + n_missing * shift ** 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (sq_full - s_full ** 2 / n_periods) / (n_periods - 1)
 
-    # For SKUs with only one period, std will be NaN -> replace with 0
-    sku_stats["std_value"] = sku_stats["std_value"].fillna(0.0)
+    # For SKUs with only one period, variance is NaN -> 0 (also clips rounding below 0)
+    std_values = np.sqrt(np.maximum(np.nan_to_num(variance, nan=0.0), 0.0))
+    mean_values = s_full / n_periods + shift
 
     # --- 5. Coefficient of Variation (CV) Calculation ---
     # CV = std / mean
-    sku_stats['cv'] = np.where(
-        sku_stats['mean_value'] == 0,
-        0.0,
-        sku_stats['std_value'] / np.abs(sku_stats['mean_value'])
-    )
+    # (mean == 0 -> CV = 0)
+    if NUMEXPR_AVAILABLE:
+        cv = ne.evaluate(
+            'where(m == 0, 0.0, s / abs(m))',
+            local_dict={'s': std_values, 'm': mean_values}
+        )
+    else:
+        cv = np.zeros(len(std_values))
+        np.divide(std_values, np.abs(mean_values), out=cv, where=(mean_values != 0))
     # Remove infinite values
-    sku_stats['cv'] = sku_stats['cv'].replace([np.inf, -np.inf], np.nan)
+    cv = np.nan_to_num(cv, nan=np.nan, posinf=np.nan, neginf=np.nan)
+
+    sku_stats = pd.DataFrame({
+        "SKU": sku_labels,
+        "n_periods": n_periods,
+        "mean_value": mean_values,
+        "std_value": std_values,
+        "cv": cv
+    })
 
     # --- 6. Define Thresholds (X, Y, Z) ---
     MIN_PERIODS = 2
@@ -147,9 +200,15 @@ def assign_xyz_groups(
         y_threshold = 0.0
     else:
         # AUTOMATIC SPLIT: 33% / 33% / 33%
-        quantiles = eligible_cvs.quantile([0.33, 0.66])
-        x_threshold = quantiles[0.33]
-        y_threshold = quantiles[0.66]
+        # Linear-interpolated quantiles from a partial sort (np.partition, O(n))
+        cvs = eligible_cvs.to_numpy(dtype=np.float64)
+        positions = np.array([0.33, 0.66]) * (len(cvs) - 1)
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.minimum(lower + 1, len(cvs) - 1)
+        partitioned = np.partition(cvs, np.unique(np.r_[lower, upper]))
+        quantiles = partitioned[lower] + (positions - lower) * (partitioned[upper] - partitioned[lower])
+        x_threshold = float(quantiles[0])
+        y_threshold = float(quantiles[1])
 
         # Manual mode (commented):
         # x_threshold = 0.5  (CV < 50% is stable)
@@ -176,46 +235,69 @@ def assign_xyz_groups(
     cols_to_merge = sku_stats[["SKU", "XYZ", "cv"]].rename(columns={"cv": "CV"})
 
     merged = pd.merge(
-        df_out,
+        df,
         cols_to_merge,
         on="SKU",
         how="left"
     )
+    # Left merge keeps the row order of df. A numeric Value is rewritten only
+    # when NaNs were filled, so an integer column keeps its dtype (as with fillna)
+    if not is_numeric:
+        merged["Value"] = values
+    elif df["Value"].hasnans:
+        merged["Value"] = df["Value"].fillna(0.0).array
     merged["XYZ"] = merged["XYZ"].fillna("")
 
-    # Add thresholds for reference
-    merged['x_threshold_33'] = x_threshold
-    merged['y_threshold_66'] = y_threshold
-
     # Final column sorting
-    new_cols = ["XYZ", "CV", "x_threshold_33", "y_threshold_66"]
+    new_cols = ["XYZ", "CV"]
     original_cols = [c for c in df.columns if c not in new_cols]
     final_df = merged[original_cols + new_cols]
 
+    # Thresholds are kept once as metadata (saved to a separate sheet),
+    # not broadcast into every row
+    thresholds = {
+        'x_threshold_33': x_threshold,
+        'y_threshold_66': y_threshold
+    }
+    final_df.attrs['thresholds'] = thresholds
+
+    if return_thresholds:
+        return final_df, thresholds
     return final_df
 
 
-def save_local_file(data: pd.DataFrame, name: str) -> None:
-    """Saves results to Excel."""
+def save_local_file(data: pd.DataFrame, name: str, meta: Optional[dict] = None) -> None:
+    """Saves results to Excel. meta (e.g. CV thresholds) goes to a 'Thresholds' sheet."""
+    # Integer period codes -> 'YYYY-MM' for the output file
+    if 'Period' in data.columns and pd.api.types.is_integer_dtype(data['Period']):
+        data = data.assign(Period=period_to_label(data['Period']))
+
     file_name = f"{name}.xlsx"
     save_path = os.path.join(OUTPUT_PATH, file_name)
 
     print(f"Saving file: {save_path}")
 
-    engine = "openpyxl"
-    try:
-        import xlsxwriter
-        engine = "xlsxwriter"
-    except ImportError:
-        pass
+    engine = EXCEL_ENGINE
 
     try:
-        with pd.ExcelWriter(save_path, engine=engine) as writer:
-            data.to_excel(writer, sheet_name="XYZ_Analysis", index=False)
+        sheets = {"XYZ_Analysis": data}
+        if meta:
+            sheets["Thresholds"] = pd.DataFrame([meta])
+
+        if engine == "xlsxwriter":
+            write_excel_streaming(sheets, save_path)
+        else:
+            with pd.ExcelWriter(save_path, engine=engine) as writer:
+                for sheet_name, sheet_data in sheets.items():
+                    sheet_data.to_excel(writer, sheet_name=sheet_name, index=False)
         print(f"✅ Successfully saved: {file_name}")
     except Exception as e:
         print(f"❌ Error saving file: {e}")
 
+    # Parquet copy for downstream steps
+    if PARQUET_AVAILABLE:
+        write_parquet_copy(data, os.path.join(OUTPUT_PATH, f"{name}.parquet"))
+
 
 # --- MAIN EXECUTION BLOCK ---
 if __name__ == "__main__":
@@ -232,9 +314,9 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # 3. Analyze
-    result_df = assign_xyz_groups(xyz_input, data_mode="dense")
+    result_df, thresholds = assign_xyz_groups(xyz_input, data_mode="dense", return_thresholds=True)
 
     # 4. Save
-    save_local_file(result_df, "xyz_analysis_output")
+    save_local_file(result_df, "xyz_analysis_output", meta=thresholds)
 
     print("--- FINISHED ---")
\ No newline at end of file